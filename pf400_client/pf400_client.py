@@ -1,13 +1,197 @@
 import os.path
+import re
 import socket
 import time
 import logging
-import json
+from logging.handlers import RotatingFileHandler
+import threading
+import contextlib
+import selectors
+import hashlib
+
+import numpy as np
+import orjson
 
 #Log Configuration
 file_path = os.path.join(os.path.split(os.path.dirname(__file__))[0]  + '/pf400_logs/robot_client_logs.log')
 
-logging.basicConfig(filename = file_path, level=logging.DEBUG, format = '[%(levelname)s] [%(asctime)s] [%(name)s] %(message)s', datefmt = '%Y-%m-%d %H:%M:%S')
+file_handler = RotatingFileHandler(file_path, maxBytes = 5 * 1024 * 1024, backupCount = 3)
+file_handler.setFormatter(logging.Formatter('[%(levelname)s] [%(asctime)s] [%(name)s] %(message)s', datefmt = '%Y-%m-%d %H:%M:%S'))
+
+logger = logging.getLogger("PF400_Client")
+logger.setLevel(logging.DEBUG)
+logger.addHandler(file_handler)
+logger.addHandler(logging.StreamHandler())
+
+class RobotConnection():
+    """
+    Description: 
+                 - Single TCP connection to one robot controller port. The TCS command server only serves one client per port
+                   and refuses any second connection, so every PF400 object talking to the same robot shares this one.
+                 - Each command holds the lock for its whole send/reply exchange, so concurrent callers (e.g. a heartbeat and a motion thread)
+                   are serialized instead of interleaving on the socket.
+                 - The connection is closed after free_socket_timeout seconds without use, so other clients can connect to the robot.
+                 - Connecting and sending give up after timeout seconds, so a dead controller can not hang the caller.
+                 - The connection is registered with a selector (epoll on Linux), which is used to wait for replies with a timeout.
+    """
+    def __init__(self, host, port, free_socket_timeout:float = 10, timeout:float = 2.0):
+
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.free_socket_timeout = free_socket_timeout
+        self.selector = None
+        self._sock = None
+        self._lock = threading.Lock()
+        self._last_used = 0
+        self._idle_timer = None
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout = self.timeout)
+        # Commands are small ASCII lines, don't let Nagle hold them back
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(sock, selectors.EVENT_READ)
+        self._sock = sock
+
+    def _discard(self):
+        if self.selector is not None:
+            self.selector.close()
+            self.selector = None
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    def _close_if_idle(self):
+        with self._lock:
+            self._idle_timer = None
+            if self._sock is None:
+                return
+            idle = time.monotonic() - self._last_used
+            if idle >= self.free_socket_timeout:
+                self._discard()
+            else:
+                self._start_idle_timer(self.free_socket_timeout - idle)
+
+    def _start_idle_timer(self, delay:float):
+        self._idle_timer = threading.Timer(delay, self._close_if_idle)
+        self._idle_timer.daemon = True
+        self._idle_timer.start()
+
+    @contextlib.contextmanager
+    def acquire(self):
+        """
+        Holds the connection for the duration of the with block, connecting first if needed.
+        A connection that raised inside the block is closed, so a late reply can not be read as the answer to the next command.
+        """
+        with self._lock:
+            if self._sock is None:
+                self._connect()
+            try:
+                yield self._sock
+            except BaseException:
+                self._discard()
+                raise
+            self._last_used = time.monotonic()
+            if self._idle_timer is None:
+                self._start_idle_timer(self.free_socket_timeout)
+
+    def close(self):
+        with self._lock:
+            if self._idle_timer is not None:
+                self._idle_timer.cancel()
+                self._idle_timer = None
+            self._discard()
+
+
+_connections = {}
+_connections_lock = threading.Lock()
+
+def get_connection(host, port):
+    """
+    Returns the shared RobotConnection for (host, port).
+    """
+    with _connections_lock:
+        connection = _connections.get((host, port))
+        if connection is None:
+            connection = _connections[(host, port)] = RobotConnection(host, port)
+        return connection
+
+
+# Fixed commands, encoded once
+_CMD_STATE = b'sysState\n'
+# Without a timeout argument hp 1 returns at once, before arm power is up. With one, the controller waits up to that many seconds
+_POWER_TIMEOUT = 20
+_CMD_POWER = b'hp 1 %d\n' % _POWER_TIMEOUT
+_CMD_POWER_OFF = b'hp 0\n'
+_CMD_POWER_STATE = b'hp\n'
+_CMD_ATTACH = b'attach 1\n'
+_CMD_ATTACH_STATE = b'attach\n'
+_CMD_HOME = b'home\n'
+_CMD_MODE = b'mode 0\n'
+_CMD_NOP = b'nop\n'
+_CMD_HALT = b'halt\n'
+_CMD_WAIT_EOM = b'waitForEom\n'
+_CMD_WHEREJ = b'wherej\n'
+
+# Queries without side effects, safe to resend when their reply was lost
+_QUERY_CMDS = frozenset((_CMD_STATE, _CMD_POWER_STATE, _CMD_ATTACH_STATE, _CMD_NOP, _CMD_WHEREJ))
+
+# Bump when the movement command format changes, so older on-disk command caches are rebuilt
+_MOVE_CMD_CACHE_VERSION = 2
+
+# Replies begin with "0" on success or a negative error code
+_REPLY_RE = re.compile(rb'^(-?\d+)')
+
+def _parse_reply(reply: bytes):
+    """
+    Returns the leading error code of a raw reply as an int (None if the reply has no code) together with the reply itself.
+    """
+    match = _REPLY_RE.match(reply)
+    return (int(match.group(1)) if match else None), reply
+
+def _command_failed(out_msg):
+    """
+    True if send_command returned its 'failed' marker or the robot replied with a negative error code.
+    """
+    if not isinstance(out_msg, str) or out_msg == 'failed':
+        return True
+    code, reply = _parse_reply(out_msg.encode('ascii'))
+    return code is not None and code < 0
+
+_recv_buffers = threading.local()
+
+def _recv_line(sock, selector = None, timeout:float = None):
+    """
+    Reads one newline-terminated reply from the socket.
+    Data is peeked into a reusable per-thread 256 byte buffer and only the bytes up to the newline are consumed,
+    so the replies that follow (e.g. of a command sequence) stay queued on the socket.
+    When a selector is given, waits on it for at most timeout seconds before every read and raises socket.timeout if nothing arrives.
+    """
+    buf = getattr(_recv_buffers, 'buf', None)
+    if buf is None:
+        buf = _recv_buffers.buf = bytearray(256)
+    view = memoryview(buf)
+
+    line = bytearray()
+    while True:
+        if selector is not None and not selector.select(timeout):
+            raise socket.timeout("No reply from the robot within {} seconds".format(timeout))
+        nbytes = sock.recv_into(view, len(buf), socket.MSG_PEEK)
+        if nbytes == 0:
+            raise ConnectionResetError("Connection closed by the robot")
+
+        end = buf.find(b'\n', 0, nbytes)
+        if end != -1:
+            nbytes = end + 1
+        sock.recv_into(view, nbytes)
+        line += view[:nbytes]
+
+        if end != -1:
+            return bytes(line)
+
 
 class PF400():
     """
@@ -25,9 +209,9 @@ class PF400():
     """
     def __init__(self, data_file_path = "robot_data.json"):
         
-        self.logger = logging.getLogger("PF400_Client")
-        self.logger.addHandler(logging.StreamHandler())
+        self.logger = logger
         
+        self.data_file_path = self.robot_data_path(data_file_path)
         robot_data, robot1, motion_profile, locations = self.load_robot_data(data_file_path)
         self.ID = robot1["id"]
         self.host = robot1["host"]
@@ -39,22 +223,45 @@ class PF400():
 
         # Predefined locations for plate transferring oparetions
         self.location_dictionary = locations
+        # Joint values of every location as one row of a contiguous array, looked up by name through _loc_index
+        self._loc_index = {name: idx for idx, name in enumerate(locations)}
+        self._locations = np.array(list(locations.values()), dtype = np.float64).reshape(len(locations), 6)
+
+        # Default profile and movement commands are fixed by the robot data, so they are built once here
+        self._profile_cmds = [
+            f"Profile {number} {' '.join(map(str, profile.values()))}\n".encode('ascii')
+            for number, profile in enumerate(self.motion_profile[:2], start = 1)
+        ]
+        self._move_cmd_cache = {}
+        self._load_move_commands()
+
+        # Persistent TCP connection to the robot, opened on demand and shared by all PF400 objects of this robot
+        self.connection = get_connection(self.host, self.port)
+        # Seconds to wait for a reply. Motion replies only arrive once the motion has ended, so they get longer
+        self.reply_timeout = 5
+        self.motion_timeout = 60
+        # Attempts for a command that timed out or lost its connection, with exponential backoff starting at retry_backoff seconds
+        self.retries = 3
+        self.retry_backoff = 0.05
 
         # TODO: CREATE AN AVAILABLE COMMAND DATA FILE AND CHECK THIS LIST BEFORE SENDING COMMANDS TO THE ROBOT TO PREVENT ERRORS.
 
-        self.logger.info("Robot created. Robot ID: {} ~ Host: {} ~ Port: {}".format(self.ID, self.host, self.port))
+        self.logger.info("Robot created. Robot ID: %s ~ Host: %s ~ Port: %s", self.ID, self.host, self.port)
     
-    def load_robot_data(self, data_file_path):
+    @staticmethod
+    def robot_data_path(data_file_path):
         # Setting parent file directory 
         current_directory = os.path.dirname(__file__)
         parent_directory = os.path.split(current_directory)[0] 
-        file_path = os.path.join(parent_directory + '/utils/'+ data_file_path)
+        return os.path.join(parent_directory + '/utils/'+ data_file_path)
 
-        # load json file
-        with open(file_path) as f:
-            data = json.load(f)
+    @classmethod
+    def load_robot_data(cls, data_file_path):
+        file_path = cls.robot_data_path(data_file_path)
 
-        f.close()
+        # load json file. Parsed on every call, which returns a fresh dict that callers can edit
+        with open(file_path, 'rb') as f:
+            data = orjson.loads(f.read())
 
         return data, data["robot_data"][0], data["robot_data"][0]["motion_profile"],data["robot_data"][0]["locations"][0]
 
@@ -81,52 +288,131 @@ class PF400():
         PF400.close()
         # self.logger.info("TCP/IP client is closed")
 
-    def send_command(self, cmd: str=None, ini_msg:str = None, err_msg:str = None, wait:int = 0.1):
+    def close(self):
+        """
+        Closes the connection to the robot. Call this at shutdown.
+        """
+        self.connection.close()
+
+    def _exchange(self, cmd: bytes, timeout:float):
+        """
+        Sends a command over the robot connection and reads the reply until the newline.
+        On a connection error the connection is discarded and the command is retried on a fresh one, up to self.retries attempts
+        with exponential backoff, but only if the controller never received it (refused or reset before sending)
+        or it is a query from _QUERY_CMDS. Anything else may still be executing, so it is never resent.
+        Returns the (code, raw reply) pair from _parse_reply.
+        """
+        for attempt in range(self.retries):
+            stage = 'connect'
+            try:
+                with self.connection.acquire() as PF400_sock:
+                    stage = 'send'
+                    PF400_sock.sendall(cmd)
+                    stage = 'reply'
+                    reply = _recv_line(PF400_sock, self.connection.selector, timeout)
+                return _parse_reply(reply)
+            except (socket.timeout, ConnectionRefusedError, ConnectionResetError, BrokenPipeError) as err:
+                # A timed out send may have partly reached the controller
+                unsent = stage == 'connect' or (stage == 'send' and not isinstance(err, socket.timeout))
+                if attempt == self.retries - 1 or not (unsent or cmd in _QUERY_CMDS):
+                    raise
+                self.logger.warning("Retrying command after: %s", err)
+                time.sleep(self.retry_backoff * 2 ** attempt)
+
+    def send_command(self, cmd: str=None, ini_msg:str = None, err_msg:str = None, wait:int = 0.1, timeout:float = None, ini_args:tuple = ()):
         """
         Send and arbitrary command to the robot
-        - command : 
+        - command : command line as str, or already encoded bytes
+        - ini_msg : optional %-style log message for the reply, formatted with ini_args
         - wait : wait time after movement is complete
+        - timeout : seconds to wait for the reply, defaults to reply_timeout
         """
 
         ##Command Checking 
         #TODO: We can check the available commands if the user enters a wrong one break
 
-        if cmd==None:
-            self.logger.info("Invalid command: " +cmd)
+        if cmd is None:
+            self.logger.error("Invalid command: %s", cmd)
             return -1 ## make it return the last valid state
         
         ##logging messages
         if ini_msg=='':
             ini_msg = 'send command'
-        if err_msg=='':
+        if not err_msg:
             err_msg = 'Failed to send command: '
 
         ##TODO check cmd against cmd list 
         ##return invalid CMD before trying to connect
 
-        PF400_sock = self.connect_robot()
-        
+        if isinstance(cmd, str):
+            cmd = cmd.encode('ascii')
+
         try:
-            PF400_sock.send(bytes(cmd.encode('ascii')))
-            robot_output = PF400_sock.recv(4096).decode("utf-8")
+            code, reply = self._exchange(cmd, timeout or self.reply_timeout)
+            robot_output = reply.decode('ascii')
             if ini_msg:
-                self.logger.info(ini_msg)
-            self.logger.info(robot_output)
+                self.logger.info(ini_msg, *ini_args)
+            if code is not None and code < 0:
+                self.logger.error("%s %s", err_msg, robot_output)
+            else:
+                self.logger.info(robot_output)
             # Wait after executing the command. Default wait time 0.1 sc
             time.sleep(wait)
         except socket.error as err:
-            self.logger.error(err_msg +' {}'.format(err))
+            self.logger.error("%s %s", err_msg, err)
 
             return('failed')## what is a failed state or it is the last state
         else:
-            self.disconnect_robot(PF400_sock)
             # Returning the output message as a list             
             return(robot_output)
 
+    def send_commands(self, cmds: list, ini_msg:str = None, ini_args:tuple = (), err_msg:str = None, wait:int = 0.1):
+        """
+        Send a sequence of commands to the robot in a single write and read one reply per command.
+        The controller queues the commands and replies to each one as it completes, so the whole sequence costs one round trip.
+        - cmds : command lines as str, or already encoded bytes
+        - ini_msg : optional %-style log message for each reply, formatted with ini_args followed by the step number (starting from 1)
+        - wait : wait time after the whole sequence is complete, not between the commands
+        Returns the list of replies, or 'failed' if the connection broke.
+        """
+        if err_msg is None:
+            err_msg = 'Failed to send command sequence: '
+
+        batch = b''.join(cmd if isinstance(cmd, bytes) else cmd.encode('ascii') for cmd in cmds)
+
+        # Checked once for the whole sequence, so nothing is formatted per step when INFO is disabled
+        log_info = self.logger.info
+        info_enabled = self.logger.isEnabledFor(logging.INFO)
+
+        # A batch is never resent, part of the motion may already have been executed
+        try:
+            with self.connection.acquire() as PF400_sock:
+                PF400_sock.sendall(batch)
+
+                robot_outputs = []
+                for count in range(len(cmds)):
+                    code, reply = _parse_reply(_recv_line(PF400_sock, self.connection.selector, self.motion_timeout))
+                    robot_output = reply.decode('ascii')
+                    robot_outputs.append(robot_output)
+
+                    if info_enabled and ini_msg:
+                        log_info(ini_msg, *ini_args, count + 1)
+                    if code is not None and code < 0:
+                        self.logger.error("%s %s", err_msg, robot_output)
+                    elif info_enabled:
+                        log_info(robot_output)
+            time.sleep(wait)
+        except socket.error as err:
+            self.logger.error("%s %s", err_msg, err)
+
+            return('failed')
+        else:
+            return(robot_outputs)
+
 
     def check_robot_state(self, wait:int = 0.1):
 
-        cmd = 'sysState\n'
+        cmd = _CMD_STATE
         input_msg = 'Checking robot state:'
         err_msg = 'Failed to check robot state:'
 
@@ -138,17 +424,17 @@ class PF400():
     def enable_power(self, wait:int = 0.1):
 
         #Send cmd to Activate the robot
-        cmd = 'hp 1\n'
+        cmd = _CMD_POWER
         ini_msg = 'Enabling power on the robot'
         err_msg = 'Failed enable_power:'
 
-        out_msg = self.send_command(cmd, ini_msg, err_msg, wait)
+        out_msg = self.send_command(cmd, ini_msg, err_msg, wait, _POWER_TIMEOUT + self.reply_timeout)
 
         return out_msg
 
     def disable_power(self, wait:int = 0.1):
 
-        cmd = 'hp 0\n'
+        cmd = _CMD_POWER_OFF
         ini_msg = 'Disabling power on the robot'
         err_msg = 'Failed disable_power:'
 
@@ -158,7 +444,7 @@ class PF400():
 
     def attach_robot(self, wait:int = 0.1):
 
-        cmd = 'attach 1\n'
+        cmd = _CMD_ATTACH
         ini_msg = "Attaching the robot"
         err_msg = "Failed to attach the robot:"
 
@@ -169,11 +455,12 @@ class PF400():
         
     def home_robot(self, wait:int = 0.1):
 
-        cmd = 'home\n'
+        cmd = _CMD_HOME
         ini_msg = 'Homing the robot'
         err_msg = 'Failed to home the robot: '
 
-        out_msg = self.send_command(cmd, ini_msg, err_msg, wait)
+        # Homing blocks on the controller until it is done, so the reply takes as long as a motion
+        out_msg = self.send_command(cmd, ini_msg, err_msg, wait, self.motion_timeout)
 
         return out_msg
 
@@ -181,16 +468,8 @@ class PF400():
     def set_profile(self, wait:int = 0.1, profile_dict:dict = {"0":0}):
 
         if len(profile_dict) == 1:
-           
-            cmd = 'Profile 1'
-            for key, value in self.motion_profile[0].items():
-                cmd += ' ' + str(value)
-            cmd += '\n'
 
-            cmd2 = 'Profile 2'
-            for key, value in self.motion_profile[1].items():
-                cmd2 += ' ' + str(value)
-            cmd2 += '\n'
+            cmd, cmd2 = self._profile_cmds
 
             ini_msg = "Setting defult values to the motion profile 1"
             ini_msg2 = "Setting defult values to the motion profile 2"
@@ -207,10 +486,7 @@ class PF400():
             ini_msg = "Setting new values to the motion profile 3"
             err_msg = 'Failed to set profile 1: '
 
-            cmd = 'Profile 3'
-            for key, value in profile_dict.items():
-                cmd += ' ' + str(value)
-            cmd += '\n'
+            cmd = f"Profile 3 {' '.join(map(str, profile_dict.values()))}\n"
 
             out_msg = self.send_command(cmd, ini_msg, err_msg, wait)
             
@@ -222,17 +498,18 @@ class PF400():
     def initialize_robot(self):
         
         # Enable power 
-        power = self.enable_power(5)
+        power = self.enable_power()
         # Attach robot
-        attach = self.attach_robot(5)
-        # Home robot
-        home = self.home_robot(15)
+        attach = self.attach_robot()
+        # Home robot and wait until the homing motion is finished
+        home = self.home_robot()
+        self.wait_before_next_move()
         # Set default motion profile
-        profile = self.set_profile(5)
+        profile = self.set_profile()
         # Check robots' current state
         rState =self.check_robot_state()
 
-        if power[0].find('-') == -1 and attach[0].find('-') == -1 and home[0].find('-') == -1 and profile[0].find('-')== -1 :
+        if not any(_command_failed(out_msg) for out_msg in (power, attach, home, profile)):
             self.logger.info("Robot initialization is successfully completed!")
         else:    
             self.logger.info("Robot initialization failed!")
@@ -264,7 +541,7 @@ class PF400():
 
     def set_robot_mode(self):
         
-        cmd = 'mode 0\n'
+        cmd = _CMD_MODE
         
         input_msg = 'Setting communication mode to 0:'
         err_msg = 'Failed to set communication mode to 0'
@@ -274,7 +551,7 @@ class PF400():
 
     def check_robot_heartbeat(self, wait:int = 0.1):
 
-        cmd = 'nop\n'
+        cmd = _CMD_NOP
         
         input_msg = 'Checking robot heartbeat:'
         err_msg = 'Failed to check robot heartbeat:'
@@ -284,9 +561,9 @@ class PF400():
 
     def check_general_state(self, wait:int = 0.1):
 
-        cmd1 = "hp\n"
-        cmd2 = "attach\n"
-        cmd3 = "sysState\n"
+        cmd1 = _CMD_POWER_STATE
+        cmd2 = _CMD_ATTACH_STATE
+        cmd3 = _CMD_STATE
 
         power_msg = self.send_command(cmd1)
         power_msg = power_msg.split(" ")
@@ -316,7 +593,7 @@ class PF400():
         Stops the robot immediately but leaves power on.
         """
 
-        cmd =  'halt\n'
+        cmd = _CMD_HALT
         input_msg = 'Stopping robot:'
         err_msg = 'Failed to stop robot:'
 
@@ -325,38 +602,82 @@ class PF400():
 
     def wait_before_next_move(self, wait:int = 0.1):
         """
-        If you want to wait for the robot to stop moving, issue a waitForEom command
+        Waits for the robot to stop moving. The controller replies to the waitForEom command only once the current motion has ended.
         """
-        pass
+        cmd = _CMD_WAIT_EOM
+        input_msg = 'Waiting for the end of motion:'
+        err_msg = 'Failed to wait for the end of motion:'
+
+        out_msg = self.send_command(cmd, input_msg, err_msg, wait, self.motion_timeout)
+        return out_msg
 
     def clear_programs(self, wait:int = 0.1):
         #TODO: CLEAR ROBOT MEMORY BEFORE STARTING A PROGRAM TO MAKE SURE THERE IS NO QUEUED PROGRAMS FROM PREVIOUS EXECUTION
         pass
 
-    def set_move_command(self, robot_location, profile:int = 2, gripper: bool = False, release: bool = False):
+    def _build_move_command(self, robot_location, profile:int, gripper: bool, release: bool):
         # TODO: FIND THE 5th JOINT VALUE FOR WHEN THE GRIPPER IS CLOSE AND OPEN
-        if profile == 1:
-            robot_command = "MoveJ 1" 
+        coords = self._locations[self._loc_index[robot_location]].tolist()
+        if gripper:
+            coords[4] = 120.0
+        elif release:
+            coords[4] = 127.0
 
-        elif profile == 2:
-            robot_command = "MoveJ 2" 
+        return f"MoveJ {profile} {' '.join(map(str, coords))}\n".encode('ascii')
 
-        elif profile == 3:    
-            robot_command = "MoveJ 3" 
+    def _build_move_commands(self, locations: list = None):
+        """
+        Fills the movement command cache for every profile and gripper state of the given locations (all locations by default).
+        Call this again after editing the location dictionary.
+        """
+        if locations is None:
+            locations = self.location_dictionary.keys()
 
-        else:
+        for robot_location in locations:
+            for profile in (1, 2, 3):
+                for gripper in (False, True):
+                    for release in (False, True):
+                        self._move_cmd_cache[(robot_location, profile, gripper, release)] = self._build_move_command(robot_location, profile, gripper, release)
+
+    def _load_move_commands(self):
+        """
+        Fills the movement command cache from utils/<data file>.cmd_cache.json when it was built from the same data file,
+        otherwise builds the commands and saves them there for the next start.
+        """
+        cache_path = os.path.splitext(self.data_file_path)[0] + '.cmd_cache.json'
+        with open(self.data_file_path, 'rb') as f:
+            data_hash = hashlib.sha256(f.read()).hexdigest()
+
+        try:
+            with open(cache_path, 'rb') as f:
+                cache = orjson.loads(f.read())
+        except (OSError, orjson.JSONDecodeError):
+            cache = None
+
+        if cache and cache.get('hash') == data_hash and cache.get('version') == _MOVE_CMD_CACHE_VERSION:
+            for robot_location, profile, gripper, release, cmd in cache['cmds']:
+                self._move_cmd_cache[(robot_location, profile, gripper, release)] = cmd.encode('ascii')
+            return
+
+        self._build_move_commands()
+
+        cache = {
+            'hash': data_hash,
+            'version': _MOVE_CMD_CACHE_VERSION,
+            'cmds': [[*key, cmd.decode('ascii')] for key, cmd in self._move_cmd_cache.items()],
+        }
+        try:
+            with open(cache_path, 'wb') as f:
+                f.write(orjson.dumps(cache))
+        except OSError as err:
+            self.logger.warning("Failed to save the movement command cache: %s", err)
+
+    def set_move_command(self, robot_location, profile:int = 2, gripper: bool = False, release: bool = False):
+
+        if profile not in (1, 2, 3):
             raise Exception("Please enter a valid motion profiile! 1 for slower movement, 2 for faster movement profile, 3 for modified profile")
-       
-        for count, location in enumerate(self.location_dictionary[robot_location]):
-            if gripper == True and count == 4:
-                robot_command += " " + str(120.0)
-            elif release == True and count == 4:
-                robot_command += " " + str(127.0)
-            else:    
-                robot_command += " " + str(location) 
-        robot_command += '\n'
-        
-        return robot_command
+
+        return self._move_cmd_cache[(robot_location, profile, bool(gripper), bool(release))]
 
     def move_single(self, target_location, profile = 2, grap: bool = False, release: bool = False, wait:int = 0.1):
 
@@ -365,10 +686,10 @@ class PF400():
         """
         single_move_commands = self.set_move_command(target_location.lower(), profile, grap, release)
 
-        input_msg = "Robot is moved to the {} location".format(target_location)
+        input_msg = "Robot is moved to the %s location"
         err_msg = 'Failed move the robot:'
 
-        out_msg = self.send_command(single_move_commands, input_msg, err_msg, wait)
+        out_msg = self.send_command(single_move_commands, input_msg, err_msg, wait, self.motion_timeout, (target_location,))
             
         return out_msg
 
@@ -402,7 +723,7 @@ class PF400():
             
     def locate_robot(self, wait:int = 0.1):
         
-        location = 'wherej\n'
+        location = _CMD_WHEREJ
 
         input_msg = "Finding robot location:"
         err_msg = 'Failed to find robot location:'
@@ -423,11 +744,10 @@ class PF400():
         pass
 
     def check_loc_data(self, target_location):
-        loc_list = list(self.location_dictionary.keys())
         idx = -1
         try:
             target_location = target_location.lower()
-            idx = loc_list.index(target_location)
+            idx = self._loc_index[target_location]
 
         except Exception:
             self.logger.error("Given location doesn't exist in the location data")
@@ -1,14 +1,23 @@
 import os.path
+import json
 import time
 import logging
-import json
+from logging.handlers import RotatingFileHandler
+import functools
+
+import numpy as np
 
 from pf400_client import PF400
 
 #Log Configuration
 file_path = os.path.join(os.path.split(os.path.dirname(__file__))[0]  + '/pf400_logs/rpl_pf400_logs.log')
 
-logging.basicConfig(filename = file_path, level=logging.DEBUG, format = '[%(levelname)s] [%(asctime)s] [%(name)s] %(message)s', datefmt = '%Y-%m-%d %H:%M:%S')
+file_handler = RotatingFileHandler(file_path, maxBytes = 5 * 1024 * 1024, backupCount = 3)
+file_handler.setFormatter(logging.Formatter('[%(levelname)s] [%(asctime)s] [%(name)s] %(message)s', datefmt = '%Y-%m-%d %H:%M:%S'))
+
+# Child of the PF400_Client logger, so RPL messages also reach robot_client_logs.log and the console
+logger = logging.getLogger("PF400_Client.RPL")
+logger.addHandler(file_handler)
 
 class RPL_PF400(PF400):
     """
@@ -18,8 +27,61 @@ class RPL_PF400(PF400):
     """
     def __init__(self, data_file_path = "robot_data.json"):
         super().__init__(data_file_path)
+        self.logger = logger
  
         self.OT2_ID = {"bob":1, "alex":2, "anna":3 , "peeler":4, "sealer":5}
+        # Seconds a plate stays in an OT2 during FULL_TRANSFER before it is picked up again
+        self.ot2_dwell_time = 50
+
+        # Movement commands of each motion plan are memoized per (plan, ot2_ID, slow, fast). Cleared when a location is saved
+        self._motion_plan = functools.lru_cache(maxsize = 256)(self._build_motion_plan)
+
+    def _build_motion_plan(self, plan:str, ot2_ID:int, slow:int, fast:int):
+
+        """
+        Decription: Builds the movement commands of a pick/drop operation. Use the memoized self._motion_plan instead of calling this directly.
+        Parameters: 
+                - plan: Name of the operation, one of pick_plate_ot2, drop_plate_ot2, pick_plate_from_rack or drop_complete_plate.
+                - ot2_ID: ID number of the OpenTrone robot the operation is executed on. Not used by drop_complete_plate.
+                - slow, fast: Motion profile numbers for the slower and the faster movements.
+        """
+        ot2 = "ot2_" + str(ot2_ID)
+
+        # Each step is (location, motion profile, gripper, release)
+        if plan == "pick_plate_ot2":
+            steps = [(ot2 + "_front", fast, False, False),
+                     (ot2 + "_above_plate", fast, False, False),
+                     (ot2 + "_pick_plate", fast, False, False),
+                     (ot2 + "_pick_plate", slow, True, False),
+                     (ot2 + "_above_plate", slow, True, False),
+                     (ot2 + "_front", slow, True, False)]
+
+        elif plan == "drop_plate_ot2":
+            steps = [(ot2 + "_front", slow, True, False),
+                     (ot2 + "_above_plate", slow, True, False),
+                     (ot2 + "_pick_plate", slow, True, False),
+                     (ot2 + "_pick_plate", slow, False, True),
+                     (ot2 + "_above_plate", fast, False, False),
+                     (ot2 + "_front", fast, False, False)]
+
+        elif plan == "pick_plate_from_rack":
+            steps = [(ot2 + "_approach_plate_rack", fast, False, False),
+                     (ot2 + "_front_plate_rack", slow, False, False),
+                     (ot2 + "_plate_rack", slow, False, False),
+                     (ot2 + "_plate_rack", slow, True, False),
+                     (ot2 + "_front_plate_rack", slow, True, False),
+                     (ot2 + "_approach_plate_rack", slow, True, False)]
+
+        elif plan == "drop_complete_plate":
+            steps = [("completed_plate_above", slow, True, False),
+                     ("completed_plate", slow, True, False),
+                     ("completed_plate", slow, False, True),
+                     ("completed_plate_above", slow, False, False)]
+
+        else:
+            raise Exception("Unknown motion plan: {}".format(plan))
+
+        return tuple(self.set_move_command(*step) for step in steps)
 
     def command_handler(self, msg):
 
@@ -59,7 +121,7 @@ class RPL_PF400(PF400):
         Parameters: 
                 - ot2_ID: ID number of the OpenTrone robot that the PF400 will be picking up the plate from
                 - profile: Motion profile number. Use "3" for custom motion profile otherwise defult profiles will be used.
-                - wait: Add a wait time between each motion command. Defult is 0.1 seconds.  
+                - wait: Wait time after the whole motion sequence is complete. The commands are sent as one batch, so there is no wait between each motion command. Defult is 0.1 seconds.  
         """
         
         # TODO:ADD Motion profile index
@@ -72,23 +134,16 @@ class RPL_PF400(PF400):
 
 
         # Set movement commands to complete a pick_plate_ot2 operation
-        move_front = self.set_move_command("ot2_" + str(ot2_ID) + "_front",fast)
-        above_plate = self.set_move_command("ot2_" + str(ot2_ID) + "_above_plate",fast)
-        approach_plate = self.set_move_command("ot2_" + str(ot2_ID) + "_pick_plate",fast)
-        pick_up_plate = self.set_move_command("ot2_" + str(ot2_ID) + "_pick_plate", slow, True, False)
-        above_with_plate = self.set_move_command("ot2_" + str(ot2_ID) + "_above_plate", slow, True, False)
-        front_with_plate = self.set_move_command("ot2_" + str(ot2_ID) + "_front", slow, True, False)
+        pick_up_commands = self._motion_plan("pick_plate_ot2", ot2_ID, slow, fast)
 
-        pick_up_commands = [move_front, above_plate, approach_plate, pick_up_plate, above_with_plate, front_with_plate] 
+        input_msg = "[pick_plate_ot2 ID:%s] Robot is moved to the %dth location"
+        err_msg = 'Failed move the robot:'
 
-        for count, cmd in enumerate(pick_up_commands):
-                   
-            input_msg = "[pick_plate_ot2 ID:{}] Robot is moved to the {}th location".format(str(ot2_ID), count+1)
-            err_msg = 'Failed move the robot:'
+        out_msgs = self.send_commands(pick_up_commands, input_msg, (ot2_ID,), err_msg, wait)
+        if out_msgs == 'failed':
+            return out_msgs
 
-            out_msg = self.send_command(cmd, input_msg, err_msg, wait)
-              
-        return out_msg
+        return out_msgs[-1]
 
 
     def drop_plate_ot2(self, ot2_ID, profile = 0, wait:int = 0.1):
@@ -98,7 +153,7 @@ class RPL_PF400(PF400):
         Parameters: 
                 - ot2_ID: ID number of the OpenTrone robot that the PF400 will be placing the plate 
                 - profile: Motion profile number. Use "3" for custom motion profile otherwise defult profiles will be used.
-                - wait: Add a wait time between each motion command. Defult is 0.1 seconds.  
+                - wait: Wait time after the whole motion sequence is complete. The commands are sent as one batch, so there is no wait between each motion command. Defult is 0.1 seconds.  
         """
 
         # Set movement commands to complete a drop_plate_ot2 operation
@@ -106,26 +161,18 @@ class RPL_PF400(PF400):
             slow, fast = 3, 3
         else:
             slow, fast = 1, 2
-            
 
-        front_with_plate = self.set_move_command("ot2_" + str(ot2_ID) + "_front", slow, True, False)
-        above_with_plate = self.set_move_command("ot2_" + str(ot2_ID) + "_above_plate", slow, True, False)
-        approach_with_plate = self.set_move_command("ot2_" + str(ot2_ID) + "_pick_plate", slow, True, False)
-        drop_plate = self.set_move_command("ot2_" + str(ot2_ID) + "_pick_plate", slow, False, True)
-        above_plate = self.set_move_command("ot2_" + str(ot2_ID) + "_above_plate", fast)
-        front_plate = self.set_move_command("ot2_" + str(ot2_ID) + "_front", fast)
 
+        drop_to_ot2 = self._motion_plan("drop_plate_ot2", ot2_ID, slow, fast)
 
-        drop_to_ot2 = [front_with_plate, above_with_plate, approach_with_plate, drop_plate, above_plate, front_plate]
-        
-        for count, cmd in enumerate(drop_to_ot2):
+        input_msg = "[drop_plate_ot2 ID:%s] Robot is moved to the %dth location"
+        err_msg = 'Failed move the robot:'
 
-            input_msg = "[drop_plate_ot2 ID:{}] Robot is moved to the {}th location".format(str(ot2_ID), count+1)
-            err_msg = 'Failed move the robot:'
+        out_msgs = self.send_commands(drop_to_ot2, input_msg, (ot2_ID,), err_msg, wait)
+        if out_msgs == 'failed':
+            return out_msgs
 
-            out_msg = self.send_command(cmd, input_msg, err_msg, wait)
-              
-        return out_msg
+        return out_msgs[-1]
                 
     def pick_plate_from_rack(self, ot2_ID, profile = 0, wait:int = 0.1):
 
@@ -134,7 +181,7 @@ class RPL_PF400(PF400):
         Parameters: 
                 - ot2_ID: ID number of the OpenTrone robot is used to specify the plate rack number. PF400 will pick up the plate from the plate rack that is on top of the same OT2, specified in this paramiter. 
                 - profile: Motion profile number. Use "3" for custom motion profile otherwise defult profiles will be used.
-                - wait: Add a wait time between each motion command. Defult is 0.1 seconds.  
+                - wait: Wait time after the whole motion sequence is complete. The commands are sent as one batch, so there is no wait between each motion command. Defult is 0.1 seconds.  
         """
         
         if profile == 3: 
@@ -142,23 +189,16 @@ class RPL_PF400(PF400):
         else:
             slow, fast = 1, 2
 
-        approach_plate_rack = self.set_move_command("ot2_" + str(ot2_ID) + "_approach_plate_rack", fast, False, False)
-        front_rack = self.set_move_command("ot2_" + str(ot2_ID) + "_front_plate_rack", slow, False, False)
-        plate_rack = self.set_move_command("ot2_" + str(ot2_ID) + "_plate_rack", slow, False, False)
-        pick_plate = self.set_move_command("ot2_" + str(ot2_ID) + "_plate_rack", slow, True, False)
-        front_with_plate = self.set_move_command("ot2_" + str(ot2_ID) + "_front_plate_rack", slow, True, False)
-        approach_rack_back = self.set_move_command("ot2_" + str(ot2_ID) + "_approach_plate_rack", slow, True, False)
+        pick_plate_rack = self._motion_plan("pick_plate_from_rack", ot2_ID, slow, fast)
 
-        pick_plate_rack = [approach_plate_rack, front_rack, plate_rack, pick_plate, front_with_plate, approach_rack_back]
-       
-        for count, cmd in enumerate(pick_plate_rack):
-                   
-            input_msg = "[pick_plate_from_rack ID:{}] Robot is moved to the {}th location".format(str(ot2_ID), count+1)
-            err_msg = 'Failed move the robot:'
-
-            out_msg = self.send_command(cmd, input_msg, err_msg, wait)
-              
-        return out_msg
+        input_msg = "[pick_plate_from_rack ID:%s] Robot is moved to the %dth location"
+        err_msg = 'Failed move the robot:'
+
+        out_msgs = self.send_commands(pick_plate_rack, input_msg, (ot2_ID,), err_msg, wait)
+        if out_msgs == 'failed':
+            return out_msgs
+
+        return out_msgs[-1]
         
 
     def drop_complete_plate(self, profile = 0, wait:int = 0.1):
@@ -167,7 +207,7 @@ class RPL_PF400(PF400):
         Decription: This function executes a series of motion commands to place the 96 well plate to the completed plate location. Program assumes that the PF400 is already carrying the plate with it's gripper. 
         Parameters: 
                 - profile: Motion profile number. Use "3" for custom motion profile otherwise defult profiles will be used.
-                - wait: Add a wait time between each motion command. Defult is 0.1 seconds.  
+                - wait: Wait time after the whole motion sequence is complete. The commands are sent as one batch, so there is no wait between each motion command. Defult is 0.1 seconds.  
         """
         
         if profile == 3: 
@@ -175,22 +215,16 @@ class RPL_PF400(PF400):
         else:
             slow, fast = 1, 2
 
-        completed_plate_above = self.set_move_command("completed_plate_above", slow, True, False)
-        drop_with_plate = self.set_move_command("completed_plate", slow, True, False)
-        drop_plate = self.set_move_command("completed_plate", slow, False, True)
-        completed_plate = self.set_move_command("completed_plate_above", slow, False, False)
-       
+        complete_plate = self._motion_plan("drop_complete_plate", None, slow, fast)
 
-        complete_plate = [completed_plate_above, drop_with_plate, drop_plate, completed_plate]
-       
-        for count, cmd in enumerate(complete_plate):
-                   
-            input_msg = "[drop_complete_plate] Robot is moved to the {}th location".format(count+1)
-            err_msg = 'Failed move the robot:'
+        input_msg = "[drop_complete_plate] Robot is moved to the %dth location"
+        err_msg = 'Failed move the robot:'
+
+        out_msgs = self.send_commands(complete_plate, input_msg, (), err_msg, wait)
+        if out_msgs == 'failed':
+            return out_msgs
 
-            out_msg = self.send_command(cmd, input_msg, err_msg, wait)
-              
-        return out_msg
+        return out_msgs[-1]
 
     def rpl_teach_location(self, location:str = None):
 
@@ -249,12 +283,17 @@ class RPL_PF400(PF400):
         current_location = self.locate_robot()
 
         # Save the current robot location to the given location
-        loc_list = list(map(float,current_location.split(" ")))
-        self.location_dictionary[location] = [loc_list[1], loc_list[2], loc_list[3], loc_list[4], loc_list[5], loc_list[6]]
+        # Reply is the error code followed by the joint values
+        loc_list = np.fromstring(current_location, dtype=np.float64, sep=' ')
+        self._locations[self._loc_index[location]] = loc_list[1:7]
+        # Keep the dictionary that is written back to the data file in sync
+        self.location_dictionary[location][:] = loc_list[1:7].tolist()
+        self._build_move_commands([location])
+        self._motion_plan.cache_clear()
     
         # Write the new location the data file
         try:
-            with open(file_path, "w") as jsonFile:
+            with open(self.data_file_path, "w") as jsonFile:
                 json.dump(self.robot_data, jsonFile, indent=4)
         except IOError as err:
             self.logger.error(err)
@@ -280,19 +319,19 @@ class RPL_PF400(PF400):
 
         if job.upper() == "TRANSFER":
 
-            self.logger.info("Executing plate transfer between OT2 ID: {} and OT2 ID: {}".format(robot_ID_1, robot_ID_2))
+            self.logger.info("Executing plate transfer between OT2 ID: %s and OT2 ID: %s", robot_ID_1, robot_ID_2)
             self.pick_plate_ot2(robot_ID_1)
-            time.sleep(2)
+            self.wait_before_next_move()
             self.drop_plate_ot2(robot_ID_2)
             
         elif job.upper() == "PLATE_RACK":
-            self.logger.info("Executing plate transfer between plate_rack and OT2 ID: {}".format(robot_ID_2))
+            self.logger.info("Executing plate transfer between plate_rack and OT2 ID: %s", robot_ID_2)
             self.pick_plate_from_rack(1)
-            time.sleep(2)
+            self.wait_before_next_move()
             self.drop_plate_ot2(robot_ID_2)
 
         elif job.upper() == "COMPLETED":
-            self.logger.info("Executing plate transfer OT2 ID: {} and completed plate location".format(robot_ID_1))
+            self.logger.info("Executing plate transfer OT2 ID: %s and completed plate location", robot_ID_1)
             self.pick_plate_ot2(robot_ID_1)
             self.drop_complete_plate()
 
@@ -301,13 +340,16 @@ class RPL_PF400(PF400):
             self.logger.info("Executing full transfer")
             self.pick_plate_from_rack(1)
             self.drop_plate_ot2(1)
-            time.sleep(50)
+            self.wait_before_next_move()
+            time.sleep(self.ot2_dwell_time)
             self.pick_plate_ot2(1)
             self.drop_plate_ot2(2)
-            time.sleep(50)
+            self.wait_before_next_move()
+            time.sleep(self.ot2_dwell_time)
             self.pick_plate_ot2(2)
             self.drop_plate_ot2(3)
-            time.sleep(50)
+            self.wait_before_next_move()
+            time.sleep(self.ot2_dwell_time)
             self.pick_plate_ot2(3)
             self.drop_complete_plate()
    